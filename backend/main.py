@@ -12,18 +12,71 @@ Run with: uvicorn main:app --reload --port 8000
 """
 
 import asyncio
+import gzip
+import hashlib
+import math
 import random
 import time
-from typing import Optional
+from typing import Optional, TypeVar
 from contextlib import asynccontextmanager
 from functools import lru_cache
 from collections import deque
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import orjson
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from pydantic import BaseModel
-from starlette.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
+from starlette.responses import JSONResponse, Response
+
+# ============================================
+# SERIALIZATION (orjson: single-pass C encoder)
+# ============================================
+
+ORJSON_OPT = orjson.OPT_SERIALIZE_NUMPY
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson instead of stdlib json."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPT)
+
+def _strong_etag(body: bytes) -> str:
+    """Content fingerprint for cached JSON payloads."""
+    return f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+def _accepts_gzip(request: Request) -> bool:
+    """Parse Accept-Encoding q-values; explicit gzip beats '*', and q=0 refuses."""
+    gzip_q = star_q = None
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if coding not in ("gzip", "*"):
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding == "gzip":
+            gzip_q = q
+        else:
+            star_q = q
+    q = gzip_q if gzip_q is not None else star_q
+    return q is not None and q > 0.0
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Check an If-None-Match header against a strong ETag."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
 
 # ============================================
 # MODELS
@@ -43,6 +96,33 @@ class DefenseToggle(BaseModel):
     name: str
     enabled: bool
 
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+def _is_json_content_type(content_type: Optional[str]) -> bool:
+    """Mirror FastAPI: JSON only when the type is missing, application/json or +json."""
+    if not content_type:
+        return True
+    maintype, _, subtype = content_type.split(";", 1)[0].strip().lower().partition("/")
+    return maintype == "application" and (subtype == "json" or subtype.endswith("+json"))
+
+async def _parse_body(request: Request, model: type[ModelT]) -> ModelT:
+    """Validate raw body bytes in one pydantic-core pass (no separate json.loads)."""
+    # Security: refuse non-JSON types (e.g. text/plain) so cross-site "simple"
+    # requests that skip CORS preflight cannot change server state
+    if not _is_json_content_type(request.headers.get("content-type")):
+        raise RequestValidationError([{
+            "type": "content_type",
+            "loc": ("body",),
+            "msg": "Expected a JSON body (application/json)",
+            "input": None,
+        }])
+    try:
+        return model.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        ) from e
+
 # ============================================
 # IN-MEMORY STATE (Replace with Redis/DB in production)
 # ============================================
@@ -54,42 +134,93 @@ defenses = [
     {"name": "Feature Squeezing", "effectiveness": 55, "overhead": 0.8, "enabled": True},
 ]
 
-active_connections: list[WebSocket] = []
-connection_configs: dict[int, dict] = {}
+# Performance: hot defense fields as parallel arrays (SoA); `defenses` stays the REST view
+_defense_idx = {d["name"]: i for i, d in enumerate(defenses)}
+_defense_eff = tuple(d["effectiveness"] for d in defenses)
+_defense_enabled = [d["enabled"] for d in defenses]
+
+active_connections: set[WebSocket] = set()
+
+# Broadcast buckets: (attack_id, epsilon, batch_ms) -> subscriber queues
+_buckets: dict[tuple[int, float, int], set[asyncio.Queue]] = {}
+_bucket_samples: dict[tuple[int, float, int], list[tuple[int, float]]] = {}
+_buckets_ready = asyncio.Event()  # Set while any bucket has subscribers
 
 # Performance: Pre-computed values
-_SUCCESS_RATES = {"fgsm": 0.85, "pgd": 0.92, "cw": 0.96, "deepfool": 0.89}
+# Attack types interned to small ints at the API boundary; rates indexed by id
+_ATTACK_TYPES = ("fgsm", "pgd", "cw", "deepfool")
+_ATTACK_IDS = {name: i for i, name in enumerate(_ATTACK_TYPES)}
+_ATTACK_PGD = _ATTACK_IDS["pgd"]
+_SUCCESS_RATES = (0.85, 0.92, 0.96, 0.89)
 _BASE_CONFIDENCE = 97.2
-
-@lru_cache(maxsize=1)
-def get_defense_boost_cached() -> float:
-    """Cached defense boost calculation for performance."""
-    return sum(d["effectiveness"] * 0.1 for d in defenses if d["enabled"])
+_LABELS = ("panda", "gibbon", "macaque")
+_WS_QUEUE_SIZE = 64
+_WS_TICK_MS = 50
+_WS_BATCH_MS = 250  # Default confidence batching window (client-tunable)
+_PONG = orjson.dumps({"type": "pong"})
+_BUCKET_FAILED = object()  # Queue sentinel: the writer closes the socket (1011)
+
+# Performance: bound C method, skips the module attribute lookup on every draw
+_rand = random.random
+
+def _now_ms() -> int:
+    """Wall-clock milliseconds via integer nanoseconds (no float round trip)."""
+    return time.time_ns() // 1_000_000
+
+def _compute_defense_boost() -> float:
+    """Confidence boost from enabled defenses (recomputed only on toggle)."""
+    return sum(e for e, on in zip(_defense_eff, _defense_enabled) if on) * 0.1
+
+# Performance: plain module floats, read per tick without a call
+_defense_boost = _compute_defense_boost()
+_defense_boost_ws = _defense_boost * 0.5  # WebSocket stream applies half the boost
+
+# Performance: /api/defenses body serialized once, rebuilt only on toggle
+_defenses_bytes = orjson.dumps({"defenses": defenses})
+_defenses_etag = _strong_etag(_defenses_bytes)
+
+def _refresh_defense_cache() -> None:
+    """Recompute cached boosts and the REST payload after a defense is toggled."""
+    global _defense_boost, _defense_boost_ws, _defenses_bytes, _defenses_etag
+    _defense_boost = _compute_defense_boost()
+    _defense_boost_ws = _defense_boost * 0.5
+    _defenses_bytes = orjson.dumps({"defenses": defenses})
+    _defenses_etag = _strong_etag(_defenses_bytes)
 
 # ============================================
 # MOCK ML FUNCTIONS (Replace with real models)
 # ============================================
 
-def generate_confidence(epsilon: float, defense_boost: float = 0) -> float:
+def _confidence_kernel(epsilon: float, defense_boost: float, u: float) -> float:
+    """Confidence math on plain floats; branch clamp is cheaper than max/min calls."""
+    confidence = _BASE_CONFIDENCE - epsilon * 800.0 + (u - 0.5) * 10.0 + defense_boost
+    if confidence < 5.0:
+        return 5.0
+    if confidence > 100.0:
+        return 100.0
+    return confidence
+
+def _success_kernel(base_rate: float, epsilon: float, defense_boost: float, u: float) -> bool:
+    """Attack success check for a uniform draw u."""
+    return u < base_rate + epsilon * 2.0 - defense_boost * 0.01
+
+def generate_confidence(epsilon: float, defense_boost: float = 0.0) -> float:
     """Simulate model confidence degradation under attack."""
-    degradation = epsilon * 800
-    noise = (random.random() - 0.5) * 10
-    confidence = _BASE_CONFIDENCE - degradation + noise + defense_boost
-    return max(5, min(100, confidence))
+    return _confidence_kernel(epsilon, defense_boost, _rand())
 
-def execute_attack(attack_type: str, epsilon: float) -> dict:
+def execute_attack(attack_id: int, epsilon: float, timestamp: Optional[int] = None) -> dict:
     """Simulate adversarial attack execution."""
-    base_rate = _SUCCESS_RATES.get(attack_type, 0.85)
-    defense_boost = get_defense_boost_cached()
+    base_rate = _SUCCESS_RATES[attack_id]
+    defense_boost = _defense_boost
 
     return {
-        "success": random.random() < (base_rate + epsilon * 2 - defense_boost * 0.01),
+        "success": _success_kernel(base_rate, epsilon, defense_boost, _rand()),
         "confidence": generate_confidence(epsilon, defense_boost),
         "perturbation_norm": epsilon * 255,
-        "iterations": 10 + int(random.random() * 30) if attack_type == "pgd" else 1,
-        "attack_type": attack_type,
+        "iterations": 10 + int(_rand() * 30) if attack_id == _ATTACK_PGD else 1,
+        "attack_type": _ATTACK_TYPES[attack_id],
         "epsilon": epsilon,
-        "timestamp": int(time.time() * 1000),
+        "timestamp": timestamp if timestamp is not None else _now_ms(),
     }
 
 @lru_cache(maxsize=1)
@@ -111,6 +242,22 @@ def get_model_architecture() -> dict:
         "trainable_params": 1234567,
     }
 
+# Performance: static payload serialized and fingerprinted once at import
+_ARCH_BYTES = orjson.dumps(get_model_architecture())
+_ARCH_ETAG = _strong_etag(_ARCH_BYTES)
+_ARCH_HEADERS = {
+    "Cache-Control": "public, max-age=86400, immutable",
+    "ETag": _ARCH_ETAG,
+    "Vary": "Accept-Encoding",
+}
+
+# Pre-compressed variant (own ETag, since it is a different representation).
+# The raw body (~515 B) is below the GZip middleware's minimum_size, so without
+# this it would always go out uncompressed; compressing once makes gzip free.
+_ARCH_GZIP = gzip.compress(_ARCH_BYTES, compresslevel=1, mtime=0)
+_ARCH_GZIP_ETAG = _strong_etag(_ARCH_GZIP)
+_ARCH_GZIP_HEADERS = {**_ARCH_HEADERS, "ETag": _ARCH_GZIP_ETAG, "Content-Encoding": "gzip"}
+
 # ============================================
 # LIFESPAN & APP SETUP
 # ============================================
@@ -118,7 +265,11 @@ def get_model_architecture() -> dict:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("AdversarialX API starting...")
+    broadcaster = asyncio.create_task(broadcast_updates())
+    broadcaster.add_done_callback(_log_broadcaster_exit)
     yield
+    broadcaster.cancel()
+    await asyncio.gather(broadcaster, return_exceptions=True)
     print("AdversarialX API shutting down...")
 
 app = FastAPI(
@@ -126,12 +277,13 @@ app = FastAPI(
     description="Adversarial ML Attack Simulation Backend",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url=None,
     redoc_url=None,
 )
 
-# Performance: GZip compression for responses
-app.add_middleware(GZipMiddleware, minimum_size=500)
+# Performance: GZip only pays off on larger bodies; level 1 is ~3x faster than 9
+app.add_middleware(GZipMiddleware, minimum_size=1500, compresslevel=1)
 
 # CORS for frontend (production + development)
 ALLOWED_ORIGINS = [
@@ -161,133 +313,252 @@ async def root():
 
 @app.get("/api/health")
 async def health():
-    return JSONResponse(
-        content={"status": "healthy", "timestamp": int(time.time() * 1000)},
+    return ORJSONResponse(
+        content={"status": "healthy", "timestamp": _now_ms()},
         headers={"Cache-Control": "no-cache"}
     )
 
-@app.post("/api/predict")
-async def predict(request: PredictionRequest):
+# Performance: hot endpoints return a Response directly, skipping FastAPI's
+# jsonable_encoder pass; payload dicts keep one fixed key order per endpoint
+@app.post("/api/predict", response_model=None)
+async def predict(request: Request):
     """Get model prediction, optionally with adversarial perturbation."""
-    epsilon = request.attack.epsilon if request.attack else 0
+    payload = await _parse_body(request, PredictionRequest)
+    epsilon = payload.attack.epsilon if payload.attack else 0
     confidence = generate_confidence(epsilon)
 
     # Simulate class predictions
-    predictions = [
-        {"label": "panda", "confidence": confidence},
-        {"label": "gibbon", "confidence": max(0, 100 - confidence - random.random() * 5)},
-        {"label": "macaque", "confidence": random.random() * 5},
-    ]
-    predictions.sort(key=lambda x: x["confidence"], reverse=True)
-
-    return {
-        "predictions": predictions,
-        "is_adversarial": request.attack is not None,
-        "timestamp": int(time.time() * 1000),
-    }
+    c0, c1, c2 = confidence, 100.0 - confidence - _rand() * 5.0, _rand() * 5.0
+    if c1 < 0.0:
+        c1 = 0.0
+    l0, l1, l2 = _LABELS
+
+    # Performance: fixed three-class output, order with at most three compares
+    # (strict > keeps ties in label order, like a stable descending sort)
+    if c1 > c0:
+        c0, c1, l0, l1 = c1, c0, l1, l0
+    if c2 > c1:
+        c1, c2, l1, l2 = c2, c1, l2, l1
+        if c1 > c0:
+            c0, c1, l0, l1 = c1, c0, l1, l0
+
+    return ORJSONResponse({
+        "predictions": [
+            {"label": l0, "confidence": c0},
+            {"label": l1, "confidence": c1},
+            {"label": l2, "confidence": c2},
+        ],
+        "is_adversarial": payload.attack is not None,
+        "timestamp": _now_ms(),
+    })
 
-@app.post("/api/attack")
-async def attack(config: AttackConfig):
+@app.post("/api/attack", response_model=None)
+async def attack(request: Request):
     """Execute adversarial attack on model."""
-    result = execute_attack(config.attack_type, config.epsilon)
-    return result
+    config = await _parse_body(request, AttackConfig)
+    return ORJSONResponse(execute_attack(_ATTACK_IDS.get(config.attack_type, 0), config.epsilon))
 
 @app.get("/api/defenses")
-async def get_defenses():
+async def get_defenses(request: Request):
     """Get available defense mechanisms and their status."""
-    return JSONResponse(
-        content={"defenses": defenses},
-        headers={"Cache-Control": "max-age=60"}
-    )
+    headers = {"Cache-Control": "max-age=60", "ETag": _defenses_etag}
+    if _etag_matches(request, _defenses_etag):
+        return Response(status_code=304, headers=headers)
+    return Response(_defenses_bytes, media_type="application/json", headers=headers)
 
 @app.post("/api/defenses/toggle")
-async def toggle_defense(toggle: DefenseToggle):
+async def toggle_defense(request: Request):
     """Toggle a defense mechanism on/off."""
-    for defense in defenses:
-        if defense["name"] == toggle.name:
-            defense["enabled"] = toggle.enabled
-            get_defense_boost_cached.cache_clear()
-            return JSONResponse(
-                content={"success": True, "defense": defense},
-                headers={"Cache-Control": "no-cache"}
-            )
-    return JSONResponse(
-        content={"success": False, "error": "Defense not found"},
-        status_code=404
+    toggle = await _parse_body(request, DefenseToggle)
+    idx = _defense_idx.get(toggle.name)
+    if idx is None:
+        return ORJSONResponse(
+            content={"success": False, "error": "Defense not found"},
+            status_code=404
+        )
+
+    _defense_enabled[idx] = toggle.enabled
+    defenses[idx]["enabled"] = toggle.enabled
+    _refresh_defense_cache()
+    return ORJSONResponse(
+        content={"success": True, "defense": defenses[idx]},
+        headers={"Cache-Control": "no-cache"}
     )
 
 @app.get("/api/model/architecture")
-async def model_architecture():
+async def model_architecture(request: Request):
     """Get neural network architecture for visualization."""
-    return get_model_architecture()
+    if _accepts_gzip(request):
+        body, etag, headers = _ARCH_GZIP, _ARCH_GZIP_ETAG, _ARCH_GZIP_HEADERS
+    else:
+        body, etag, headers = _ARCH_BYTES, _ARCH_ETAG, _ARCH_HEADERS
+
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 # ============================================
 # WEBSOCKET STREAMING (Optimized for Low Latency)
 # ============================================
 
+def _put_latest(queue: asyncio.Queue, msg: object) -> None:
+    """Enqueue without blocking; on overflow drop the oldest (stale) frame."""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(msg)
+
+def _subscribe(key: tuple[int, float, int], queue: asyncio.Queue) -> None:
+    _buckets.setdefault(key, set()).add(queue)
+    _buckets_ready.set()
+
+def _unsubscribe(key: tuple[int, float, int], queue: asyncio.Queue) -> None:
+    subscribers = _buckets.get(key)
+    if subscribers is None:
+        return
+    subscribers.discard(queue)
+    if not subscribers:
+        del _buckets[key]
+        _bucket_samples.pop(key, None)
+
+def _fan_out(subscribers: set[asyncio.Queue], payload: object) -> None:
+    for queue in subscribers:
+        _put_latest(queue, payload)
+
+async def broadcast_updates():
+    """Single producer for all sockets: one frame per config bucket, fanned out as bytes."""
+    global _buckets_ready
+    _buckets_ready = asyncio.Event()  # Bind to the serving loop
+    while True:
+        # Performance: park with zero wakeups while nobody is subscribed
+        if not _buckets:
+            _buckets_ready.clear()
+            await _buckets_ready.wait()
+
+        timestamp = _now_ms()
+        for key, subscribers in list(_buckets.items()):
+            attack_id, epsilon, batch_ms = key
+            try:
+                # Performance: coalesce (timestamp, value) samples into one frame per batch window
+                samples = _bucket_samples.setdefault(key, [])
+                samples.append((timestamp, generate_confidence(epsilon, _defense_boost_ws)))
+
+                # Attack results are rare, send them unbatched
+                if _rand() > 0.9:
+                    result = execute_attack(attack_id, epsilon, timestamp)
+                    _fan_out(subscribers, orjson.dumps({"type": "attack_result", "data": result}))
+
+                if len(samples) * _WS_TICK_MS >= batch_ms:
+                    _fan_out(subscribers, orjson.dumps({"type": "confidence_batch", "data": samples}))
+                    samples.clear()
+            except Exception as e:
+                # Isolate failures: drop the broken bucket and close its sockets
+                # (no silent streams), keep streaming the rest
+                print(f"Broadcast error in bucket {key}: {e!r}")
+                _buckets.pop(key, None)
+                _bucket_samples.pop(key, None)
+                _fan_out(subscribers, _BUCKET_FAILED)
+
+        await asyncio.sleep(_WS_TICK_MS / 1000)
+
+def _log_broadcaster_exit(task: asyncio.Task) -> None:
+    """Surface a broadcaster that stopped for any reason other than shutdown."""
+    if task.cancelled():
+        return
+    print(f"Broadcaster stopped unexpectedly: {task.exception()!r}")
+
 @app.websocket("/ws/attacks")
 async def websocket_attacks(websocket: WebSocket):
     """Stream real-time attack simulation data with optimized latency."""
     await websocket.accept()
-    active_connections.append(websocket)
-
-    conn_id = id(websocket)
-    connection_configs[conn_id] = {"epsilon": 0.03, "attack_type": "fgsm", "is_running": True}
-
-    try:
-        async def send_updates():
-            while connection_configs[conn_id]["is_running"]:
-                defense_boost = get_defense_boost_cached() * 0.5
-                confidence = generate_confidence(
-                    connection_configs[conn_id]["epsilon"],
-                    defense_boost
-                )
+    active_connections.add(websocket)
+
+    # Per-socket config lives on the connection itself; bound to a local once
+    websocket.state.cfg = {"epsilon": 0.03, "attack_id": 0, "batch_ms": _WS_BATCH_MS}
+    cfg = websocket.state.cfg
+
+    # Performance: the broadcaster fills a bounded queue, one writer owns the socket
+    out_q: asyncio.Queue = asyncio.Queue(maxsize=_WS_QUEUE_SIZE)
+    bucket: Optional[tuple[int, float, int]] = None
+    pause_event = asyncio.Event()  # Set while streaming, cleared while paused
+    pause_event.set()
+
+    def resubscribe():
+        nonlocal bucket
+        if bucket is not None:
+            _unsubscribe(bucket, out_q)
+            bucket = None
+        if pause_event.is_set():
+            bucket = (cfg["attack_id"], cfg["epsilon"], cfg["batch_ms"])
+            _subscribe(bucket, out_q)
+
+    async def write_updates():
+        # Sole sender on this socket. Paused sockets are unsubscribed, so the
+        # queue stays empty (no wakeups) except for control frames like pong.
+        while True:
+            payload = await out_q.get()
+            if payload is _BUCKET_FAILED:
+                await websocket.close(code=1011, reason="stream failed")
+                return
+            if pause_event.is_set() or payload is _PONG:
+                await websocket.send_bytes(payload)
+
+    async def read_commands():
+        while True:
+            data = await websocket.receive_json()
 
+            if data.get("type") == "config":
+                # Validate before anything reaches the shared broadcaster;
+                # a malformed config is ignored and only affects this socket
                 try:
-                    await websocket.send_json({
-                        "type": "confidence",
-                        "data": {"value": confidence, "timestamp": int(time.time() * 1000)},
-                    })
-
-                    if random.random() > 0.9:
-                        result = execute_attack(
-                            connection_configs[conn_id]["attack_type"],
-                            connection_configs[conn_id]["epsilon"]
-                        )
-                        await websocket.send_json({
-                            "type": "attack_result",
-                            "data": result,
-                        })
-                except Exception:
-                    break
-
-                await asyncio.sleep(0.05)
-
-        update_task = asyncio.create_task(send_updates())
-
-        while True:
-            try:
-                data = await asyncio.wait_for(websocket.receive_json(), timeout=1.0)
-                config = connection_configs[conn_id]
-
-                if data.get("type") == "config":
-                    config["epsilon"] = data.get("epsilon", config["epsilon"])
-                    config["attack_type"] = data.get("attack_type", config["attack_type"])
-                elif data.get("type") == "pause":
-                    config["is_running"] = False
-                elif data.get("type") == "resume":
-                    config["is_running"] = True
-            except asyncio.TimeoutError:
+                    epsilon = float(data.get("epsilon", cfg["epsilon"]))
+                    batch_ms = int(data.get("batch_ms", cfg["batch_ms"]))
+                except (TypeError, ValueError, OverflowError):
+                    continue
+                if not math.isfinite(epsilon):
+                    continue
+
+                cfg["epsilon"] = epsilon
+                if "attack_type" in data:
+                    cfg["attack_id"] = _ATTACK_IDS.get(data["attack_type"], 0)
+                cfg["batch_ms"] = max(_WS_TICK_MS, min(1000, batch_ms))
+            elif data.get("type") == "pause":
+                pause_event.clear()
+                while not out_q.empty():
+                    out_q.get_nowait()
+            elif data.get("type") == "resume":
+                pause_event.set()
+            elif data.get("type") == "ping":
+                # Keepalive: routed through the writer, delivered even while paused/warm
+                _put_latest(out_q, _PONG)
                 continue
+            resubscribe()
+
+    # Pre-warmed sockets (?warm=1) connect paused and start streaming on "resume"
+    if websocket.query_params.get("warm") == "1":
+        pause_event.clear()
+    resubscribe()
+    tasks = [
+        asyncio.create_task(write_updates()),
+        asyncio.create_task(read_commands()),
+    ]
 
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
     except WebSocketDisconnect:
         pass
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
-        if websocket in active_connections:
-            active_connections.remove(websocket)
-        connection_configs.pop(conn_id, None)
+        # Synchronous cleanup first so it runs even if this handler is cancelled
+        if bucket is not None:
+            _unsubscribe(bucket, out_q)
+        active_connections.discard(websocket)
+        for task in tasks:
+            task.cancel()
+        # Shielded so a cancelled handler re-raises its own cancellation, not gather's
+        await asyncio.shield(asyncio.gather(*tasks, return_exceptions=True))
 
 # ============================================
 # PRODUCTION INTEGRATION EXAMPLES
@@ -334,4 +605,15 @@ To integrate real ML models, replace the mock functions above:
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+    # Performance: libuv event loop + C HTTP parser (both ship with uvicorn[standard]).
+    # Single worker on purpose: defense state lives in process memory.
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        ws="websockets",
+        ws_per_message_deflate=False,  # Tiny frequent frames: zlib costs more than it saves
+    )
@@ -213,12 +213,38 @@ export const fetchDefenseMetrics = async () => {
   }
 }
 
+/**
+ * Pre-warm the attack stream socket
+ *
+ * Opt-in: nothing calls this yet, because no page consumes createAttackStream.
+ * A page that streams should call it on mount so the TCP/WS handshake is done
+ * before the user starts an attack. The socket connects with ?warm=1, which
+ * the backend keeps paused (no frames sent) until createAttackStream adopts
+ * it and sends { type: 'resume' }. Send { type: 'ping' } to get a
+ * { type: 'pong' } back.
+ */
+let warmSocket = null
+
+export const prewarmAttackStream = () => {
+  if (CONFIG.USE_TFJS || CONFIG.USE_MOCK || !CONFIG.WS_URL || CONFIG.WS_URL.includes('localhost')) return
+  if (warmSocket && warmSocket.readyState <= WebSocket.OPEN) return
+  try {
+    warmSocket = new WebSocket(`${CONFIG.WS_URL}/attacks?warm=1`)
+  } catch (error) {
+    console.warn('[Stream] Pre-warm failed:', error)
+    warmSocket = null
+  }
+}
+
 /**
  * Stream real-time attack metrics via WebSocket
  *
  * REAL IMPLEMENTATION:
  * WebSocket connection to /ws/attacks
- * Messages: { type: 'confidence'|'attack_result', data: {} }
+ * Messages: { type: 'confidence_batch'|'attack_result', data: {} }
+ * confidence_batch data is [[timestamp, value], ...]; it is unpacked into
+ * individual 'confidence' messages before reaching onMessage.
+ * Send { type: 'config', batch_ms } to tune the batching window.
  */
 export const createAttackStream = (onMessage, onError) => {
   if (CONFIG.USE_TFJS) {
@@ -287,8 +313,28 @@ export const createAttackStream = (onMessage, onError) => {
 
   try {
     console.log('[Stream] Connecting to:', CONFIG.WS_URL)
-    const ws = new WebSocket(`${CONFIG.WS_URL}/attacks`)
-    ws.onmessage = (event) => onMessage(JSON.parse(event.data))
+    const warm = warmSocket && warmSocket.readyState <= WebSocket.OPEN ? warmSocket : null
+    warmSocket = null
+    const ws = warm || new WebSocket(`${CONFIG.WS_URL}/attacks`)
+    if (warm) {
+      const resume = () => ws.send(JSON.stringify({ type: 'resume' }))
+      if (ws.readyState === WebSocket.OPEN) resume()
+      else ws.addEventListener('open', resume, { once: true })
+    }
+    // Backend sends orjson-encoded binary frames; decode before parsing
+    ws.binaryType = 'arraybuffer'
+    const decoder = new TextDecoder()
+    ws.onmessage = (event) => {
+      const text = typeof event.data === 'string' ? event.data : decoder.decode(event.data)
+      const message = JSON.parse(text)
+      if (message.type === 'confidence_batch') {
+        for (const [timestamp, value] of message.data) {
+          onMessage({ type: 'confidence', data: { value, timestamp } })
+        }
+      } else {
+        onMessage(message)
+      }
+    }
     ws.onerror = (error) => {
       console.warn('[Stream] WebSocket error, falling back to mock:', error)
       onError(error)
@@ -405,6 +451,7 @@ export default {
   fetchPrediction,
   executeAttack,
   fetchDefenseMetrics,
+  prewarmAttackStream,
   createAttackStream,
   fetchModelArchitecture,
   CONFIG,